@@ -1,18 +1,52 @@
 # tools/dependency_fixer.py - Simplified for local use
 import os
 import json
+import functools
 import re
 import sys
 from pathlib import Path
+from collections import defaultdict
+
+from unreal_dependency_crawler import iter_file_entries
+
+# Sidecar in the project root recording the Build.cs files already processed
+BUILD_CACHE_NAME = ".netforge_build_cache.json"
+
+# Quote and angle bracket includes written exactly as #include "X" / #include <X>,
+# matched against raw file bytes
+_INCLUDE_PATTERN = re.compile(rb'#include (?:"([^"]+)"|<([^>]+)>)')
+
+# Common engine includes, which resolve to themselves
+ENGINE_INCLUDES = {
+    "CoreMinimal.h": "CoreMinimal.h",
+    "Modules/ModuleManager.h": "Modules/ModuleManager.h",
+    "UObject/NoExportTypes.h": "UObject/NoExportTypes.h",
+    "UObject/Interface.h": "UObject/Interface.h",
+    "Components/ActorComponent.h": "Components/ActorComponent.h",
+    "OnlineSubsystem.h": "OnlineSubsystem.h",
+    "OnlineSessionSettings.h": "OnlineSessionSettings.h",
+    "OnlineSubsystemTypes.h": "OnlineSubsystemTypes.h",
+    "HAL/ThreadSafeBool.h": "HAL/ThreadSafeBool.h",
+    "Templates/SharedPointer.h": "Templates/SharedPointer.h",
+    "Containers/Ticker.h": "Containers/Ticker.h"
+}
+
+# A run of consecutive include lines; missing includes are inserted after the first such run
+_INCLUDE_BLOCK_RE = re.compile(rb'((?:#include\s+[<"][^>"]+[>"]\s*\n)+)')
 
 print("Script execution started")
 
 class DependencyFixer:
     def __init__(self, report_path, project_root):
         self.project_root = Path(project_root)
-        with open(report_path) as f:
+        with open(report_path, encoding='utf-8') as f:  # orjson-written reports are UTF-8
             self.report = json.load(f)
         self.fixed_issues = 0
+        self.include_set_cache = {}  # Includes present in each touched file, keyed by report path
+        self._file_index = None  # {file name: [paths]} under Source/ and Plugins/, built on first lookup
+        self._pending_writes = {}  # {full path: new content}, flushed once all issues are processed
+        # Many issues share the same include, so resolve each (include, in Plugins) pair once
+        self._resolve_include = functools.lru_cache(maxsize=4096)(self._resolve_include)
         self.engine_path = self._detect_engine_path()
         
     def _detect_engine_path(self):
@@ -36,6 +70,18 @@ class DependencyFixer:
         print("⚠️ Could not auto-detect Unreal Engine path. Some fixes may not be applied.")
         return None
     
+    def _get_file_index(self):
+        """Index every file under Source/ and Plugins/ by name with a single directory walk"""
+        if self._file_index is None:
+            self._file_index = defaultdict(list)
+            for root_dir in ["Source", "Plugins"]:
+                root = self.project_root / root_dir
+                if not root.is_dir():
+                    continue  # e.g. a project without Plugins/
+                for entry in iter_file_entries(root):
+                    self._file_index[entry.name].append(Path(entry.path))
+        return self._file_index
+    
     def fix_all_issues(self):
         """Fix all dependency issues in the report"""
         print(f"🔍 Found {len(self.report['issues'])} issues to fix")
@@ -48,9 +94,22 @@ class DependencyFixer:
         # Update build files to ensure correct include paths
         self._update_build_files()
         
+        self.flush_writes()
+        
         print(f"✅ Fixed {self.fixed_issues} dependency issues")
         return self.fixed_issues
     
+    def _get_include_set(self, file_path, data):
+        """Get the set of includes in a file, parsing its content the first time it is touched"""
+        includes = self.include_set_cache.get(file_path)
+        if includes is None:
+            includes = {
+                (quoted or angled).decode('utf-8', errors='ignore')
+                for quoted, angled in _INCLUDE_PATTERN.findall(data)
+            }
+            self.include_set_cache[file_path] = includes
+        return includes
+    
     def _fix_missing_include(self, file_path, include_file):
         """Fix a missing include in a file"""
         full_path = self.project_root / file_path
@@ -59,12 +118,16 @@ class DependencyFixer:
             return
                 
         try:
-            # Read the file content
-            with open(full_path, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
+            # Use the pending edit if this file was already fixed, otherwise read the raw
+            # file content; edits are made on the bytes so the file is never decoded
+            data = self._pending_writes.get(full_path)
+            if data is None:
+                with open(full_path, 'rb') as f:
+                    data = f.read()
                     
             # Check if include already exists
-            if f'#include "{include_file}"' in content or f'#include <{include_file}>' in content:
+            includes = self._get_include_set(file_path, data)
+            if include_file in includes:
                 print(f"⚠️ Include '{include_file}' already exists in {file_path}")
                 return
                     
@@ -76,22 +139,19 @@ class DependencyFixer:
                 print(f"⚠️ Could not determine correct path for {include_file}")
                 return
                     
-            # Add the include at the top of the file after existing includes
-            include_section_match = re.search(r'((?:#include\s+[<"].*[>"]\s*\n)+)', content)
-            if include_section_match:
-                section_end = include_section_match.end()
-                new_content = (content[:section_end] + 
-                            f'#include "{corrected_include}"\n' + 
-                            content[section_end:])
-            else:
-                new_content = f'#include "{corrected_include}"\n' + content
+            newline = b'\r\n' if b'\r\n' in data else b'\n'  # Content is not newline-translated
+            include_line = f'#include "{corrected_include}"'.encode('utf-8') + newline
+            
+            # Add the include after the first include block, or at the top of the file
+            include_section_match = _INCLUDE_BLOCK_RE.search(data)
+            section_end = include_section_match.end() if include_section_match else 0
+            new_data = data[:section_end] + include_line + data[section_end:]
                 
-            # Only write if content actually changed
-            if new_content != content:
-                print(f"✓ Writing changes to {file_path}")
-                with open(full_path, 'w', encoding='utf-8') as f:
-                    f.write(new_content)
+            # Only queue a write if content actually changed
+            if new_data != data:
+                self._pending_writes[full_path] = new_data
                     
+                includes.add(corrected_include)
                 self.fixed_issues += 1
                 print(f"✓ Added include '{corrected_include}' to {file_path}")
             else:
@@ -102,25 +162,45 @@ class DependencyFixer:
             import traceback
             traceback.print_exc()
     
+    def flush_writes(self):
+        """Write all pending file edits, skipping files whose content on disk already matches"""
+        for full_path, new_data in self._pending_writes.items():
+            try:
+                if full_path.read_bytes() == new_data:
+                    print(f"⚠️ No changes needed for {full_path}")
+                    continue
+                
+                print(f"✓ Writing changes to {full_path}")
+                full_path.write_bytes(new_data)
+            except Exception as e:
+                print(f"❌ Error writing {full_path}: {str(e)}")
+        
+        self._pending_writes.clear()
+    
     def _find_correct_include_path(self, include_file, source_file):
         """Find the correct path for an include file"""
-        # Handle common engine includes
-        engine_includes = {
-            "CoreMinimal.h": "CoreMinimal.h",
-            "Modules/ModuleManager.h": "Modules/ModuleManager.h",
-            "UObject/NoExportTypes.h": "UObject/NoExportTypes.h",
-            "UObject/Interface.h": "UObject/Interface.h",
-            "Components/ActorComponent.h": "Components/ActorComponent.h",
-            "OnlineSubsystem.h": "OnlineSubsystem.h",
-            "OnlineSessionSettings.h": "OnlineSessionSettings.h",
-            "OnlineSubsystemTypes.h": "OnlineSubsystemTypes.h",
-            "HAL/ThreadSafeBool.h": "HAL/ThreadSafeBool.h",
-            "Templates/SharedPointer.h": "Templates/SharedPointer.h",
-            "Containers/Ticker.h": "Containers/Ticker.h"
-        }
+        resolved = self._resolve_include(include_file, "Plugins" in source_file)
+        if not isinstance(resolved, tuple):
+            return resolved
         
-        if include_file in engine_includes:
-            return engine_includes[include_file]
+        # Prefer the project file closest to the source file
+        if resolved:
+            source_dir = (self.project_root / source_file).parent
+            rel_path = min((os.path.relpath(path, source_dir) for path in resolved), key=len)
+            return rel_path.replace('\\', '/')
+                
+        # If we can't find it, return the original as fallback
+        return include_file
+    
+    def _resolve_include(self, include_file, in_plugins):
+        """Resolve an include independently of the including file's directory (memoized per instance)
+        
+        Returns the include path to use (None for generated headers), or a tuple of the
+        project files matching the include when the path depends on the source location.
+        """
+        # Handle common engine includes
+        if include_file in ENGINE_INCLUDES:
+            return ENGINE_INCLUDES[include_file]
             
         # Handle generated headers
         if include_file.endswith('.generated.h'):
@@ -128,36 +208,52 @@ class DependencyFixer:
             
         # Handle project-specific includes based on analysis of your report
         if include_file == "NetForgeTypes.h":
-            if "Plugins" in source_file:
+            if in_plugins:
                 return "NetForgeUE/Public/Core/NetForgeTypes.h"
             else:
                 return "Core/NetForgeTypes.h"
                 
         if include_file == "INetForgeMonitoring.h":
-            if "Plugins" in source_file:
+            if in_plugins:
                 return "Interfaces/INetForgeMonitoring.h"
             
         if include_file == "INetForgeSessions.h":
-            if "Plugins" in source_file:
+            if in_plugins:
                 return "Interfaces/INetForgeSessions.h"
                 
         # Try to find the file in the project structure
-        for root_dir in ["Source", "Plugins"]:
-            for path in Path(self.project_root / root_dir).glob(f"**/{include_file}"):
-                rel_path = os.path.relpath(path, (self.project_root / source_file).parent)
-                return rel_path.replace('\\', '/')
-                
-        # If we can't find it, return the original as fallback
-        return include_file
+        include_parts = Path(include_file).parts
+        return tuple(
+            path for path in self._get_file_index().get(include_parts[-1], [])
+            if path.parts[-len(include_parts):] == include_parts
+        )
+    
+    def _load_build_cache(self, cache_path):
+        """Load the {Build.cs path: [mtime_ns, size]} sidecar from a previous run"""
+        try:
+            with open(cache_path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}  # First run or unreadable cache; every Build.cs file gets processed
     
     def _update_build_files(self):
         """Update Build.cs files to add missing include paths"""
-        build_files = []
-        for ext in ["*.Build.cs", "*.build.cs"]:
-            build_files.extend(self.project_root.glob(f"**/{ext}"))
+        # Build.cs files unchanged since the last run were already updated (or didn't need it)
+        cache_path = self.project_root / BUILD_CACHE_NAME
+        build_cache = self._load_build_cache(cache_path)
+        updated_cache = {}
+        
+        for entry in iter_file_entries(self.project_root, (".Build.cs", ".build.cs")):
+            build_file = Path(entry.path)
+            cache_key = build_file.relative_to(self.project_root).as_posix()
             
-        for build_file in build_files:
             try:
+                stat = entry.stat()
+                signature = [stat.st_mtime_ns, stat.st_size]
+                if build_cache.get(cache_key) == signature:
+                    updated_cache[cache_key] = signature
+                    continue
+                
                 with open(build_file, 'r', encoding='utf-8', errors='ignore') as f:
                     content = f.read()
                     
@@ -183,6 +279,17 @@ class DependencyFixer:
                             
                         self.fixed_issues += 1
                         print(f"✓ Updated module dependencies in {build_file.name}")
+                        
+                        stat = build_file.stat()
+                        signature = [stat.st_mtime_ns, stat.st_size]
+                
+                updated_cache[cache_key] = signature
                 
             except Exception as e:
-                print(f"❌ Error updating {build_file}: {str(e)}")
\ No newline at end of file
+                print(f"❌ Error updating {build_file}: {str(e)}")
+        
+        try:
+            with open(cache_path, 'w', encoding='utf-8') as f:
+                json.dump(updated_cache, f, indent=2)
+        except OSError as e:
+            print(f"⚠️ Could not save {BUILD_CACHE_NAME}: {e}")
@@ -3,11 +3,39 @@ import os
 import json
 import re
 from pathlib import Path
+from collections import defaultdict
+
+try:
+    import ahocorasick  # Optional: match all of a file's candidate includes in one pass
+except ImportError:
+    ahocorasick = None
+
+try:
+    import orjson  # Optional: serializes reports directly to bytes in C
+except ImportError:
+    orjson = None
+
+# Quote and angle bracket includes, written exactly as the report checks them
+INCLUDE_PATTERN = re.compile(r'#include (?:"([^"]+)"|<([^>]+)>)')
+
+def find_existing_includes(content, include_files):
+    """Return the subset of include_files already included (quote or angle bracket) in content"""
+    if ahocorasick is None:
+        existing_includes = {quoted or angled for quoted, angled in INCLUDE_PATTERN.findall(content)}
+        return existing_includes.intersection(include_files)
+    
+    automaton = ahocorasick.Automaton()
+    for include_file in include_files:
+        automaton.add_word(f'#include "{include_file}"', include_file)
+        automaton.add_word(f'#include <{include_file}>', include_file)
+    automaton.make_automaton()
+    
+    return {include_file for _, include_file in automaton.iter(content)}
 
 def validate_dependency_report(report_path):
     """Validate a dependency report by checking if issues actually exist"""
     # Load the report
-    with open(report_path) as f:
+    with open(report_path, encoding='utf-8') as f:
         report = json.load(f)
     
     project_root = os.path.dirname(os.path.dirname(os.path.abspath(report_path)))
@@ -16,34 +44,48 @@ def validate_dependency_report(report_path):
     valid_issues = []
     false_positives = []
     
+    # Group issues by file so each file is checked and read only once
+    issues_by_file = defaultdict(list)
     for issue in report.get('issues', []):
         if issue.get('type') == 'missing_include':
-            file_path = issue.get('file')
-            include_file = issue.get('message', '').split("'")[1]
-            
-            # Check if the file exists
-            full_path = os.path.join(project_root, file_path)
-            if not os.path.exists(full_path):
-                # File doesn't exist, so issue is invalid
-                false_positives.append({
-                    'issue': issue,
-                    'reason': 'File not found'
-                })
-                continue
-            
-            # Check if include already exists
-            with open(full_path, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
-                
-            if f'#include "{include_file}"' in content or f'#include <{include_file}>' in content:
-                # Include already exists, so issue is a false positive
-                false_positives.append({
-                    'issue': issue,
-                    'reason': 'Include already exists'
-                })
-            else:
-                # Issue is valid
-                valid_issues.append(issue)
+            issues_by_file[issue.get('file')].append(issue)
+    
+    # Existing includes per file, or None when the file doesn't exist
+    existing_by_file = {}
+    for file_path, file_issues in issues_by_file.items():
+        # Check if the file exists
+        full_path = os.path.join(project_root, file_path)
+        if not os.path.exists(full_path):
+            existing_by_file[file_path] = None
+            continue
+
+        # Find which of the reported includes are already in the file
+        with open(full_path, 'r', encoding='utf-8', errors='ignore') as f:
+            content = f.read()
+        include_files = [issue.get('message', '').split("'")[1] for issue in file_issues]
+        existing_by_file[file_path] = find_existing_includes(content, include_files)
+
+    # Classify issues in the order the report lists them
+    for issue in report.get('issues', []):
+        if issue.get('type') != 'missing_include':
+            continue
+
+        existing_includes = existing_by_file[issue.get('file')]
+        if existing_includes is None:
+            # File doesn't exist, so issue is invalid
+            false_positives.append({
+                'issue': issue,
+                'reason': 'File not found'
+            })
+        elif issue.get('message', '').split("'")[1] in existing_includes:
+            # Include already exists, so issue is a false positive
+            false_positives.append({
+                'issue': issue,
+                'reason': 'Include already exists'
+            })
+        else:
+            # Issue is valid
+            valid_issues.append(issue)
     
     # Create validated report
     validated_report = {
@@ -56,8 +98,12 @@ def validate_dependency_report(report_path):
     
     # Save validated report
     validated_path = os.path.join(os.path.dirname(report_path), 'validated_dependency_report.json')
-    with open(validated_path, 'w') as f:
-        json.dump(validated_report, f, indent=2)
+    if orjson is not None:
+        with open(validated_path, 'wb') as f:
+            f.write(orjson.dumps(validated_report, option=orjson.OPT_INDENT_2))
+    else:
+        with open(validated_path, 'w') as f:
+            json.dump(validated_report, f, indent=2)
     
     print(f"Validation complete: {len(valid_issues)} valid issues, {len(false_positives)} false positives")
     print(f"Validated report saved to {validated_path}")
@@ -4,13 +4,184 @@
 
 import os
 import re
+import mmap
 import sys
 import json
+import logging
 import argparse
+import functools
 import networkx as nx
-import matplotlib.pyplot as plt
 from pathlib import Path
-from collections import defaultdict
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import hyperscan  # Optional: DFA-based multi-pattern matching for header scans
+except ImportError:
+    hyperscan = None
+
+try:
+    import orjson  # Optional: serializes reports directly to bytes in C
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    _json_dumps = orjson.dumps
+else:
+    def _json_dumps(obj):
+        """Serialize obj to UTF-8 JSON bytes, like orjson.dumps"""
+        return json.dumps(obj).encode('utf-8')
+
+log = logging.getLogger("netforge.deps")
+
+# Directories that never contain hand-written sources and are pruned from every walk
+SKIP_DIRS = frozenset({"Intermediate", "Binaries", ".git", "Saved"})
+
+def iter_file_entries(root, suffixes=None, skip_dirs=SKIP_DIRS):
+    """Yield os.DirEntry objects for files under root whose names end with one of suffixes (all files if None)"""
+    stack = [os.fspath(root)]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in skip_dirs:
+                            stack.append(entry.path)
+                    elif suffixes is None or entry.name.endswith(suffixes):
+                        yield entry
+        except OSError as e:
+            print(f"    ⚠️ Error scanning {e.filename}: {e.strerror}")
+
+# Header patterns, compiled once per process so pool workers reuse them for every file.
+# Headers are scanned as raw bytes since every token of interest is ASCII.
+_INCLUDE_PATTERN = re.compile(rb'#include\s+(?:"([^"]+)"|<([^>]+)>)')  # Quote and angle bracket includes in one pass
+_CLASS_PATTERN = re.compile(rb'(UCLASS|USTRUCT|UENUM)\s*\([^)]*\)\s*\n*\s*(class|struct|enum\s+class)\s+(\w+)')
+_INTERFACE_PATTERN = re.compile(rb'class\s+\w+_API\s+I(\w+)')
+_OVERRIDE_PATTERN = re.compile(rb'virtual\s+\w+\s+(\w+)\s*\([^)]*\)\s*override')
+_API_MACRO_PATTERN = re.compile(rb'(\w+)_API')
+# Patterns applied to every header, matched in a single pass when hyperscan is available
+_HEADER_PATTERNS = (_INCLUDE_PATTERN, _CLASS_PATTERN, _INTERFACE_PATTERN, _OVERRIDE_PATTERN, _API_MACRO_PATTERN)
+
+# Below this many headers the process pool start-up costs more than it saves
+_PARALLEL_THRESHOLD = 256
+
+@functools.lru_cache(maxsize=None)
+def _compile_hyperscan_db():
+    """Compile the header patterns into one hyperscan database, or None to use re"""
+    if hyperscan is None:
+        return None
+    
+    try:
+        db = hyperscan.Database()
+        db.compile(
+            expressions=[p.pattern for p in _HEADER_PATTERNS],
+            ids=list(range(len(_HEADER_PATTERNS))),
+            elements=len(_HEADER_PATTERNS),
+            flags=[hyperscan.HS_FLAG_SOM_LEFTMOST] * len(_HEADER_PATTERNS)
+        )
+        return db
+    except hyperscan.error as e:
+        print(f"⚠️ Could not compile hyperscan database, falling back to re: {e}")
+        return None
+
+def _find_header_matches(content):
+    """Return a list of matches for each of _HEADER_PATTERNS, in the same order"""
+    hs_db = _compile_hyperscan_db()
+    if hs_db is None:
+        # Materialize the scanners: an unfinished finditer keeps a buffer export on the
+        # content, which would stop _parse_header from closing the mmap
+        return [list(pattern.finditer(content)) for pattern in _HEADER_PATTERNS]
+    
+    # Hyperscan reports every end offset of a match; only the start offsets are needed
+    starts = [set() for _ in _HEADER_PATTERNS]
+    
+    def on_match(pattern_id, start, end, flags, context):
+        starts[pattern_id].add(start)
+    
+    hs_db.scan(content, match_event_handler=on_match)
+    
+    # Re-run the re pattern at each start offset to recover its groups, skipping
+    # overlapping matches so the results line up with re.finditer
+    results = []
+    for pattern, pattern_starts in zip(_HEADER_PATTERNS, starts):
+        matches = []
+        last_end = -1
+        for start in sorted(pattern_starts):
+            if start < last_end:
+                continue
+            match = pattern.match(content, start)
+            if match:
+                matches.append(match)
+                last_end = match.end()
+        results.append(matches)
+    return results
+
+def _read_file(file_path):
+    """Memory-map a file read-only; returns an mmap the caller must close, or b"" for empty or unreadable files"""
+    try:
+        with open(file_path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b""  # Empty files cannot be mapped
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except Exception as e:
+        print(f"    ⚠️ Error reading {file_path}: {e}")
+        return b""
+
+def _parse_header(header_file, project_root):
+    """Parse a single header in a worker process, returning only plain data for _merge_header_results"""
+    relative_path = str(Path(header_file).relative_to(project_root))
+    api_name = None
+    edges = []
+    verbatim_includes = []
+    types = []
+    interfaces = []
+    override_issues = []
+    content = _read_file(header_file)
+    
+    try:
+        include_matches, type_matches, interface_matches, override_matches, api_matches = \
+            _find_header_matches(content)
+        
+        # Find module API macro (only the first one is needed)
+        api_match = api_matches[0] if api_matches else None
+        if api_match:
+            api_name = api_match.group(1).decode('ascii')
+        
+        # Find quote and angle bracket includes in a single scan
+        for match in include_matches:
+            group = 1 if match.group(1) else 2
+            include = match.group(group).decode('utf-8', errors='ignore')
+            edges.append((relative_path, include))
+            # Exactly one space between #include and the opening quote/bracket
+            if match.group(0).startswith((b'#include "', b'#include <')):
+                verbatim_includes.append(include)
+        
+        # Find UE type definitions
+        for match in type_matches:
+            types.append(match.group(3).decode('ascii'))
+        
+        # Find interface definitions
+        for match in interface_matches:
+            interfaces.append(f"I{match.group(1).decode('ascii')}")
+        
+        # Find override methods
+        for match in override_matches:
+            method_name = match.group(1).decode('ascii')
+            if "Implementation" in method_name:
+                base_method = method_name.replace("_Implementation", "")
+                override_issues.append({
+                    "file": relative_path,
+                    "type": "interface_mismatch",
+                    "message": f"Method '{method_name}' contains '_Implementation' suffix but uses override - interface method should be '{base_method}'"
+                })
+    except Exception as e:
+        return relative_path, api_name, edges, verbatim_includes, types, interfaces, override_issues, e
+    finally:
+        # Every match has been copied out above, so the mapping can be released
+        if isinstance(content, mmap.mmap):
+            content.close()
+    
+    return relative_path, api_name, edges, verbatim_includes, types, interfaces, override_issues, None
 
 class UnrealDependencyCrawler:
     def __init__(self, project_root):
@@ -21,144 +192,110 @@ class UnrealDependencyCrawler:
         self.type_definitions = {}
         self.type_references = {}
         self.issues = []
-        self.file_content_cache = {}  # Cache file contents to avoid repeated reads
+        self.include_set_cache = {}  # Includes written verbatim in each scanned header, for O(1) existence checks
+        self.header_nodes = []  # Scanned headers in scan order, so validation skips non-header nodes
         
-        # Regex patterns
-        self.include_pattern = re.compile(r'#include\s+"([^"]+)"')
-        self.angle_include_pattern = re.compile(r'#include\s+<([^>]+)>')  # NEW: Also match angle bracket includes
-        self.generated_pattern = re.compile(r'#include\s+"([^"]+\.generated\.h)"')
-        self.class_pattern = re.compile(r'(UCLASS|USTRUCT|UENUM)\s*\([^)]*\)\s*\n*\s*(class|struct|enum\s+class)\s+(\w+)')
-        self.interface_pattern = re.compile(r'class\s+\w+_API\s+I(\w+)')
-        self.override_pattern = re.compile(r'virtual\s+\w+\s+(\w+)\s*\([^)]*\)\s*override')
-        self.api_macro_pattern = re.compile(r'(\w+)_API')
+        # Regex patterns (header patterns live at module level for the worker processes)
+        self.generated_pattern = re.compile(rb'#include\s+"([^"]+\.generated\.h)"')
+        self.dependency_pattern = re.compile(r'PublicDependencyModuleNames.AddRange\(\s*new string\[\] \{([^}]+)\}\s*\)')
+        self.include_path_pattern = re.compile(r'PublicIncludePaths.AddRange\(\s*new string\[\] \{([^}]+)\}\s*\)')
+        self.quoted_string_pattern = re.compile(r'"([^"]+)"')
         
     def scan_build_files(self):
         """Scan all Build.cs files to extract module dependencies and include paths"""
         print("🔍 Scanning Build.cs files...")
         
-        for build_file in self.project_root.rglob("*.Build.cs"):
-            module_name = build_file.stem
-            print(f"  📦 Found module: {module_name}")
+        for entry in iter_file_entries(self.project_root, (".Build.cs",)):
+            build_file = Path(entry.path)
+            module_name = sys.intern(build_file.stem)
+            log.debug("  📦 Found module: %s", module_name)
             
             with open(build_file, 'r', encoding='utf-8', errors='ignore') as f:
                 content = f.read()
                 
                 # Extract module dependencies
-                dependency_pattern = re.compile(r'PublicDependencyModuleNames.AddRange\(\s*new string\[\] \{([^}]+)\}\s*\)')
-                matches = dependency_pattern.findall(content)
+                matches = self.dependency_pattern.findall(content)
                 if matches:
                     for match in matches:
-                        modules = re.findall(r'"([^"]+)"', match)
+                        modules = self.quoted_string_pattern.findall(match)
                         for dep_module in modules:
+                            dep_module = sys.intern(dep_module)
                             self.dependency_graph.add_edge(module_name, dep_module)
-                            print(f"    ↔️ Dependency: {module_name} -> {dep_module}")
+                            log.debug("    ↔️ Dependency: %s -> %s", module_name, dep_module)
                 
                 # Extract include paths
-                include_path_pattern = re.compile(r'PublicIncludePaths.AddRange\(\s*new string\[\] \{([^}]+)\}\s*\)')
-                matches = include_path_pattern.findall(content)
+                matches = self.include_path_pattern.findall(content)
                 if matches:
                     for match in matches:
-                        paths = re.findall(r'"([^"]+)"', match)
+                        paths = self.quoted_string_pattern.findall(match)
                         for path in paths:
                             # Resolve relative paths
                             if "ModuleDirectory" in path:
                                 path = path.replace("ModuleDirectory", str(build_file.parent))
                             self.include_paths.append(path)
-                            print(f"    📁 Include path: {path}")
+                            log.debug("    📁 Include path: %s", path)
     
     def scan_header_files(self):
         """Scan all header files to build dependency graph and type definitions"""
         print("\n🔍 Scanning header files...")
         
-        for header_file in self.project_root.rglob("*.h"):
-            if "Intermediate" in str(header_file) or "Binaries" in str(header_file):
-                continue
-                
-            relative_path = header_file.relative_to(self.project_root)
-            print(f"  📄 Analyzing: {relative_path}")
-            
-            try:
-                # Cache file content for later use
-                content = self._get_file_content(header_file)
-                self.file_content_cache[str(relative_path)] = content
-                
-                # Find module API macro
-                api_matches = self.api_macro_pattern.findall(content)
-                if api_matches:
-                    module_name = api_matches[0]
-                    self.module_map[str(relative_path)] = module_name
-                
-                # Find includes
-                includes = self.include_pattern.findall(content)
-                # Also find angle bracket includes
-                angle_includes = self.angle_include_pattern.findall(content)
-                all_includes = includes + angle_includes
-                
-                for include in all_includes:
-                    self.dependency_graph.add_edge(str(relative_path), include)
-                    print(f"    ↔️ Include: {include}")
-                
-                # Find UE type definitions
-                type_matches = self.class_pattern.findall(content)
-                for _, type_kind, type_name in type_matches:
-                    self.type_definitions[type_name] = str(relative_path)
-                    print(f"    🏷️ Type defined: {type_name}")
-                
-                # Find interface definitions
-                interface_matches = self.interface_pattern.findall(content)
-                for interface_name in interface_matches:
-                    full_name = f"I{interface_name}"
-                    self.type_definitions[full_name] = str(relative_path)
-                    print(f"    🔌 Interface defined: {full_name}")
-                
-                # Find override methods
-                override_matches = self.override_pattern.findall(content)
-                for method_name in override_matches:
-                    if "Implementation" in method_name:
-                        base_method = method_name.replace("_Implementation", "")
-                        self.issues.append({
-                            "file": str(relative_path),
-                            "type": "interface_mismatch",
-                            "message": f"Method '{method_name}' contains '_Implementation' suffix but uses override - interface method should be '{base_method}'"
-                        })
-            except Exception as e:
-                print(f"    ❌ Error processing {relative_path}: {e}")
+        header_files = [entry.path for entry in iter_file_entries(self.project_root, (".h",))]
+        parse = functools.partial(_parse_header, project_root=self.project_root)
+        
+        # Headers are parsed independently, so fan them out across cores and merge here
+        if len(header_files) < _PARALLEL_THRESHOLD:
+            self._merge_header_results(map(parse, header_files))
+        else:
+            with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+                self._merge_header_results(executor.map(parse, header_files, chunksize=64))
     
-    def _get_file_content(self, file_path):
-        """Get file content with error handling"""
-        try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                return f.read()
-        except Exception as e:
-            print(f"    ⚠️ Error reading {file_path}: {e}")
-            return ""
+    def _merge_header_results(self, results):
+        """Merge _parse_header results into the crawler state"""
+        # Collect include edges for all files and add them to the graph in one call
+        all_edges = []
+        for relative_path, api_name, edges, verbatim_includes, types, interfaces, override_issues, error in results:
+            # Results arrive as fresh strings from the workers; intern them so every path,
+            # include and name shared by the graph and the lookup tables is stored once
+            relative_path = sys.intern(relative_path)
+            self.header_nodes.append(relative_path)
+            log.debug("  📄 Analyzing: %s", relative_path)
+            
+            if api_name:
+                self.module_map[relative_path] = sys.intern(api_name)
+            
+            includes = [sys.intern(include) for _, include in edges]
+            all_edges.extend((relative_path, include) for include in includes)
+            self.include_set_cache[relative_path] = {sys.intern(include) for include in verbatim_includes}
+            
+            for type_name in types:
+                self.type_definitions[sys.intern(type_name)] = relative_path
+                log.debug("    🏷️ Type defined: %s", type_name)
+            
+            for full_name in interfaces:
+                self.type_definitions[sys.intern(full_name)] = relative_path
+                log.debug("    🔌 Interface defined: %s", full_name)
+            
+            self.issues.extend(override_issues)
+            
+            if error is not None:
+                print(f"    ❌ Error processing {relative_path}: {error}")
+        
+        self.dependency_graph.add_edges_from(all_edges)
     
     def _check_include_already_exists(self, file_path, include_name):
-        """Check if an include already exists in the file - NEW METHOD"""
-        if file_path not in self.file_content_cache:
-            full_path = self.project_root / file_path
-            if full_path.exists():
-                self.file_content_cache[file_path] = self._get_file_content(full_path)
-            else:
-                return False
-        
-        content = self.file_content_cache[file_path]
-        
-        # Check for both quote and angle bracket includes
-        return f'#include "{include_name}"' in content or f'#include <{include_name}>' in content
+        """Check if a scanned file already has #include "X" or #include <X> written exactly"""
+        return include_name in self.include_set_cache.get(file_path, ())
     
     def validate_dependencies(self):
         """Validate all dependencies and identify issues"""
         print("\n🔍 Validating dependencies...")
         
-        for node in self.dependency_graph.nodes():
-            if not node.endswith('.h'):
-                continue  # Skip non-header nodes
-                
-            for dependency in list(self.dependency_graph.successors(node)):
+        for node in self.header_nodes:
+            # Headers without includes never became graph nodes
+            for dependency in self.dependency_graph.adj.get(node, ()):
                 # CRITICAL FIX: First check if the include already exists in the file
                 if self._check_include_already_exists(node, dependency):
-                    print(f"  ✅ Include already exists: {node} -> {dependency}")
+                    log.debug("  ✅ Include already exists: %s -> %s", node, dependency)
                     continue
                 
                 # Check if dependency file exists directly
@@ -185,9 +322,11 @@ class UnrealDependencyCrawler:
         print("\n🔍 Checking for circular dependencies...")
         
         try:
-            cycles = list(nx.simple_cycles(self.dependency_graph))
-            for cycle in cycles:
-                if len(cycle) > 1:  # Ignore self-references
+            # Enumerating every simple cycle is exponential on dense include graphs, so
+            # report one shortest cycle per strongly connected component instead
+            for component in nx.strongly_connected_components(self.dependency_graph):
+                if len(component) > 1:  # Ignore self-references
+                    cycle = self._shortest_cycle(component)
                     cycle_str = " -> ".join(cycle) + " -> " + cycle[0]
                     self.issues.append({
                         "type": "circular_dependency",
@@ -197,6 +336,27 @@ class UnrealDependencyCrawler:
         except Exception as e:
             print(f"  ⚠️ Error detecting cycles: {e}")
     
+    def _shortest_cycle(self, component):
+        """Find a shortest cycle inside a strongly connected component using BFS"""
+        start = min(component)  # Stable choice so reports don't change between runs
+        parents = {start: None}
+        queue = deque([start])
+        
+        while queue:
+            node = queue.popleft()
+            for successor in self.dependency_graph.successors(node):
+                if successor == start:
+                    cycle = [node]
+                    while parents[cycle[-1]] is not None:
+                        cycle.append(parents[cycle[-1]])
+                    cycle.reverse()
+                    return cycle
+                if successor in component and successor not in parents:
+                    parents[successor] = node
+                    queue.append(successor)
+        
+        return [start]  # Not reached: every node of a non-trivial component lies on a cycle
+    
     def generate_report(self):
         """Generate a detailed report of findings"""
         report = {
@@ -228,12 +388,25 @@ class UnrealDependencyCrawler:
                     print(f"    • {issue['message']}")
         
         # Save report to file
-        with open("dependency_report.json", "w") as f:
-            json.dump(report, f, indent=2)
+        self._write_report(report, "dependency_report.json")
         print("\n✅ Report saved to dependency_report.json")
         
         return report
     
+    def _write_report(self, report, report_path):
+        """Stream the report as JSON one issue at a time instead of building it as a single string"""
+        with open(report_path, "wb", buffering=1 << 20) as f:
+            f.write(b'{\n')
+            for key, value in report.items():
+                if key != "issues":
+                    f.write(b'  ' + _json_dumps(key) + b': ' + _json_dumps(value) + b',\n')
+            
+            f.write(b'  "issues": [')
+            for index, issue in enumerate(report["issues"]):
+                f.write(b',\n    ' if index else b'\n    ')
+                f.write(_json_dumps(issue))
+            f.write(b'\n  ]\n}\n' if report["issues"] else b']\n}\n')
+    
     def visualize_dependencies(self):
         """Create a visual representation of dependencies"""
         print("\n🎨 Generating dependency visualization...")
@@ -246,14 +419,20 @@ class UnrealDependencyCrawler:
             if source in self.module_map and target in self.module_map:
                 vis_graph.add_edge(self.module_map[source], self.module_map[target])
         
-        # Draw the graph
-        plt.figure(figsize=(12, 8))
-        pos = nx.spring_layout(vis_graph)
-        nx.draw(vis_graph, pos, with_labels=True, node_color="lightblue", 
-                node_size=2000, font_size=10, arrows=True)
-        plt.title("Module Dependencies")
-        plt.savefig("dependency_graph.png")
-        print("✅ Visualization saved to dependency_graph.png")
+        # Write the graph as GraphViz DOT; layout and rendering are left to dot/sfdp
+        def quote(name):
+            return '"' + name.replace('\\', '\\\\').replace('"', '\\"') + '"'
+        
+        with open("dependency_graph.dot", "w", encoding="utf-8") as f:
+            f.write('digraph "Module Dependencies" {\n')
+            f.write('  node [shape=box, style=filled, fillcolor=lightblue];\n')
+            for node in vis_graph.nodes():
+                f.write(f'  {quote(node)};\n')
+            for source, target in vis_graph.edges():
+                f.write(f'  {quote(source)} -> {quote(target)};\n')
+            f.write('}\n')
+        print("✅ Visualization saved to dependency_graph.dot")
+        print("   Render with: dot -Tpng dependency_graph.dot -o dependency_graph.png")
     
     def run_analysis(self):
         """Run the complete dependency analysis"""
@@ -269,8 +448,15 @@ class UnrealDependencyCrawler:
 def main():
     parser = argparse.ArgumentParser(description="Unreal Engine Dependency Crawler")
     parser.add_argument("--project-dir", default=".", help="Path to the Unreal project directory")
+    parser.add_argument("--verbose", action="store_true", help="Print per-file scan details")
     args = parser.parse_args()
     
+    # Per-file details go through logging and are off unless --verbose is given
+    logging.basicConfig(format="%(message)s", stream=sys.stdout)
+    log.setLevel(logging.DEBUG if args.verbose else logging.INFO)
+    # Summary output is written in bulk, so don't flush stdout on every line
+    sys.stdout.reconfigure(line_buffering=False)
+    
     print("🚀 Starting Unreal Engine Dependency Crawler")
     print(f"📁 Project directory: {args.project_dir}")
     